@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for the shortest_path backend.
+
+Run from this directory with:
+    PRELOAD_GRAPH=1 gunicorn shortest_path.wsgi
+
+preload_app loads shortest_path.wsgi (and with PRELOAD_GRAPH, the graph
+snapshot) once in the master; the workers share it copy-on-write.
+
+Workers log Rss/Pss/Private_Dirty at fork, every MEMORY_LOG_EVERY requests
+and on exit; Pss and Private_Dirty show what each worker actually costs and
+how much of the shared snapshot it has un-shared.
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+preload_app = True
+
+MEMORY_LOG_EVERY = int(os.getenv("GUNICORN_MEMORY_LOG_EVERY", "100"))
+
+
+def log_memory(log, worker, event):
+    from maps.preload import format_memory, memory_usage_kb
+
+    log.info("Worker %s %s: %s", worker.pid, event, format_memory(memory_usage_kb()))
+
+
+def post_fork(server, worker):
+    log_memory(server.log, worker, "started")
+
+
+def post_request(worker, req, environ, resp):
+    if MEMORY_LOG_EVERY and worker.nr % MEMORY_LOG_EVERY == 0:
+        log_memory(worker.log, worker, f"after {worker.nr} requests")
+
+
+def worker_exit(server, worker):
+    log_memory(server.log, worker, f"exiting after {worker.nr} requests")
+
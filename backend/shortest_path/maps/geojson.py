@@ -0,0 +1,62 @@
+import json
+import math
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from . import views
+
+# Bundled Jodhpur road network (tracked with git-lfs)
+DEFAULT_GEOJSON = settings.BASE_DIR.parent / 'utils' / 'jodhpurosm' / 'lines.geojson'
+
+
+def build_snapshot_from_geojson(file_path):
+    """
+    Builds a snapshot straight from an OSM lines GeoJSON export, without the database.
+    Uses the same road filter and edge weights as utils/utiljodhpur.py, so it can
+    be used offline on the bundled Jodhpur data (e.g. by the replay_routes command).
+    """
+    road_types = {'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential'}
+
+    with open(file_path) as f:
+        features = json.load(f)["features"]
+
+    node_ids = {}
+    graph = {}
+    coords = {}
+
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        if (feature.get("properties") or {}).get("highway") not in road_types:
+            continue
+        if geometry.get("type") != "LineString":
+            continue
+
+        points = [tuple(point[:2]) for point in geometry["coordinates"]]
+        for lon, lat in points:
+            if (lon, lat) not in node_ids:
+                node_id = len(node_ids) + 1
+                node_ids[(lon, lat)] = node_id
+                graph[node_id] = []
+                coords[node_id] = (lat, lon)
+
+        for start, end in zip(points, points[1:]):
+            weight = math.dist(start, end)  # Planar length, like LineString.length
+            graph[node_ids[start]].append((node_ids[end], weight))
+            graph[node_ids[end]].append((node_ids[start], weight))
+
+    return views.index_snapshot(graph, coords, version="geojson")
+
+
+def load_geojson_snapshot(file_path):
+    """
+    Builds a snapshot from GeoJSON for the management commands, turning
+    unreadable input into a CommandError.
+    """
+    try:
+        return build_snapshot_from_geojson(file_path)
+    except (OSError, json.JSONDecodeError, KeyError, TypeError) as e:
+        raise CommandError(
+            f"Could not read GeoJSON from {file_path} ({e}). The bundled data is stored "
+            f"with git-lfs; run `git lfs pull` if this is a pointer file."
+        )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maps import views
+from maps.preload import format_memory, memory_usage_kb, warm
+
+
+class Command(BaseCommand):
+    help = "Warms the graph snapshot and reports build time, time-to-first-route and RSS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', choices=['astar', 'dijkstra'], default='astar')
+        parser.add_argument('--reload', action='store_true', help="Drop the cached graph and rebuild it from the database")
+
+    def handle(self, *args, **options):
+        stats = warm(reload=options['reload'])
+        self.stdout.write(f"Snapshot built in {stats['seconds'] * 1000:.1f} ms")
+        self.stdout.write(f"Before warm-up: {format_memory(stats['memory_before'])}")
+        self.stdout.write(f"After warm-up:  {format_memory(stats['memory_after'])}")
+
+        snapshot = views.get_snapshot()
+        index_ids = snapshot["index_ids"]
+        if len(index_ids) < 2:
+            self.stdout.write(self.style.WARNING("Graph has fewer than two nodes, skipping first route"))
+            return
+
+        # Route between the southernmost and northernmost nodes, looked up by
+        # coordinates like a real request would be
+        coords = snapshot["coords"]
+        start_lat, start_lon = coords[index_ids[0]]
+        end_lat, end_lon = coords[index_ids[-1]]
+
+        started = time.perf_counter()
+        start_node = views.find_closest_node(start_lat, start_lon)
+        end_node = views.find_closest_node(end_lat, end_lon)
+        if options['algorithm'] == 'dijkstra':
+            distance, path = views.dijkstra(snapshot["graph"], start_node, end_node)
+        else:
+            distance, path = views.astar(snapshot["graph"], start_node, end_node)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Time to first route ({options['algorithm']}): {elapsed * 1000:.1f} ms "
+            f"({len(path)} nodes, distance {distance:.4f})"
+        )
+        self.stdout.write(f"After first route: {format_memory(memory_usage_kb())}")
@@ -0,0 +1,171 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from maps import views
+from maps.geojson import DEFAULT_GEOJSON, load_geojson_snapshot
+
+QUERY_PARAMS = ('start_lat', 'start_lon', 'end_lat', 'end_lon')
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a JSONL route query log against dijkstra_api / astar_api and reports "
+        "throughput, latency percentiles, error rate and route cache hit ratio. "
+        "Without --url the queries go through the in-process test client, with the "
+        "graph built from the bundled Jodhpur GeoJSON (no database or network needed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help="JSONL query log (from ROUTE_QUERY_LOG or sample_routes)")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--geojson', default=str(DEFAULT_GEOJSON), help="OSM lines GeoJSON for in-process replay")
+        parser.add_argument('--rate', type=float, default=0, help="Requests per second (0 = as fast as possible)")
+        parser.add_argument('--concurrency', type=int, default=1, help="Maximum requests in flight")
+        parser.add_argument('--limit', type=int, help="Replay only the first N queries")
+        parser.add_argument('--timeout', type=float, default=30, help="HTTP timeout in seconds")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        if options['rate'] < 0:
+            raise CommandError("--rate must not be negative")
+        if options['limit'] is not None and options['limit'] < 0:
+            raise CommandError("--limit must not be negative")
+
+        queries = self.read_log(options['log'])[:options['limit']]
+        if not queries:
+            raise CommandError(f"No queries found in {options['log']}")
+
+        if options['url']:
+            send = self.http_sender(options['url'].rstrip('/'), options['timeout'])
+            results, elapsed = self.replay(queries, send, options['rate'], options['concurrency'])
+        else:
+            views.set_snapshot(load_geojson_snapshot(options['geojson']))
+
+            # Isolated in-memory caches so the hit ratio only reflects this replay
+            with override_settings(
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'routes': {
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                        'OPTIONS': {'MAX_ENTRIES': settings.CACHES['routes']['OPTIONS']['MAX_ENTRIES']},
+                    },
+                },
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                send = self.client_sender()
+                results, elapsed = self.replay(queries, send, options['rate'], options['concurrency'])
+
+        self.report(results, elapsed)
+
+    def read_log(self, path):
+        queries = []
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise CommandError(f"{path}:{line_number}: {e}")
+                if not isinstance(entry, dict):
+                    raise CommandError(f"{path}:{line_number}: expected a JSON object")
+
+                algorithm = entry.get('algorithm', 'astar')
+                if algorithm not in ('astar', 'dijkstra'):
+                    raise CommandError(f"{path}:{line_number}: unknown algorithm {algorithm!r}")
+                params = {key: entry.get(key) for key in QUERY_PARAMS}
+                queries.append(reverse(f'{algorithm}_api') + '?' + urlencode(params))
+        return queries
+
+    def http_sender(self, base_url, timeout):
+        def send(path):
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+                    response.read()
+                    return response.status, response.headers.get('X-Route-Cache')
+            except urllib.error.HTTPError as e:
+                return e.code, e.headers.get('X-Route-Cache')
+            except (urllib.error.URLError, OSError):
+                return None, None
+
+        return send
+
+    def client_sender(self):
+        local = threading.local()
+
+        def send(path):
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False)
+            response = local.client.get(path)
+            return response.status_code, response.get('X-Route-Cache')
+
+        return send
+
+    def replay(self, queries, send, rate, concurrency):
+        """
+        Sends every query and returns [(status, cache, latency)] and the wall time.
+        With --rate, latency is measured from the scheduled send time so that
+        queueing behind a saturated pool is counted rather than hidden.
+        """
+        results = []
+        lock = threading.Lock()
+
+        def run(path, scheduled):
+            status, cache_status = send(path)
+            latency = time.perf_counter() - scheduled
+            with lock:
+                results.append((status, cache_status, latency))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i, path in enumerate(queries):
+                if rate:
+                    scheduled = started + i / rate
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(run, path, scheduled)
+                else:
+                    pool.submit(lambda path=path: run(path, time.perf_counter()))
+
+        return results, time.perf_counter() - started
+
+    def report(self, results, elapsed):
+        latencies = sorted(latency * 1000 for _, _, latency in results)
+        errors = sum(1 for status, _, _ in results if status is None or status >= 400)
+        hits = sum(1 for _, cache_status, _ in results if cache_status == 'hit')
+        misses = sum(1 for _, cache_status, _ in results if cache_status == 'miss')
+
+        self.stdout.write(f"Requests:     {len(results)} in {elapsed:.2f} s")
+        self.stdout.write(f"Throughput:   {len(results) / elapsed:.1f} req/s")
+        self.stdout.write(
+            f"Latency (ms): p50 {percentile(latencies, 50):.1f}  p95 {percentile(latencies, 95):.1f}  "
+            f"p99 {percentile(latencies, 99):.1f}  max {latencies[-1]:.1f}"
+        )
+        self.stdout.write(f"Error rate:   {errors / len(results):.2%} ({errors} errors)")
+        if hits + misses:
+            self.stdout.write(f"Cache hits:   {hits / (hits + misses):.2%} ({hits} of {hits + misses})")
+        else:
+            self.stdout.write("Cache hits:   n/a (no X-Route-Cache headers)")
@@ -0,0 +1,57 @@
+import json
+import random
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.geojson import DEFAULT_GEOJSON, load_geojson_snapshot
+
+
+class Command(BaseCommand):
+    help = "Writes a synthetic JSONL route query log over the bundled Jodhpur data, for replay_routes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Number of queries to write")
+        parser.add_argument('--output', help="Output file (defaults to stdout)")
+        parser.add_argument('--geojson', default=str(DEFAULT_GEOJSON), help="OSM lines GeoJSON to sample nodes from")
+        parser.add_argument('--algorithm', choices=['astar', 'dijkstra', 'mixed'], default='mixed')
+        parser.add_argument('--distinct', type=int, help="Number of distinct routes to draw from (defaults to count)")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['count'] < 0:
+            raise CommandError("count must not be negative")
+        if options['distinct'] is not None and options['distinct'] < 1:
+            raise CommandError("--distinct must be at least 1")
+
+        rng = random.Random(options['seed'])
+        coords = load_geojson_snapshot(options['geojson'])["coords"]
+        node_ids = list(coords)
+        if len(node_ids) < 2:
+            raise CommandError(f"{options['geojson']} has fewer than two road nodes, cannot sample routes")
+
+        # A smaller pool of distinct routes makes repeated queries (and cache hits) more likely
+        distinct = options['distinct'] or options['count']
+        routes = [rng.sample(node_ids, 2) for _ in range(distinct)]
+
+        out = open(options['output'], 'w') if options['output'] else sys.stdout
+        try:
+            for _ in range(options['count']):
+                start, end = rng.choice(routes)
+                algorithm = options['algorithm']
+                if algorithm == 'mixed':
+                    algorithm = rng.choice(['astar', 'dijkstra'])
+
+                entry = {
+                    "ts": time.time(),
+                    "algorithm": algorithm,
+                    "start_lat": coords[start][0],
+                    "start_lon": coords[start][1],
+                    "end_lat": coords[end][0],
+                    "end_lon": coords[end][1],
+                }
+                out.write(json.dumps(entry) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+ROUTE_APIS = {'dijkstra_api': 'dijkstra', 'astar_api': 'astar'}
+
+
+class RouteQueryLogMiddleware:
+    """
+    Appends every dijkstra_api / astar_api query to a JSONL file for later replay
+    with the replay_routes command. Enabled by setting ROUTE_QUERY_LOG to a file path.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log_path = os.getenv('ROUTE_QUERY_LOG')
+        self.lock = threading.Lock()
+
+        if not self.log_path:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        if match is None or match.url_name not in ROUTE_APIS:
+            return response
+
+        entry = {
+            "ts": time.time(),
+            "algorithm": ROUTE_APIS[match.url_name],
+            "start_lat": request.GET.get('start_lat'),
+            "start_lon": request.GET.get('start_lon'),
+            "end_lat": request.GET.get('end_lat'),
+            "end_lon": request.GET.get('end_lon'),
+            "status": response.status_code,
+            "latency_ms": round(elapsed * 1000, 3),
+        }
+
+        with self.lock:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+        return response
@@ -0,0 +1,78 @@
+import gc
+import os
+import time
+
+from django.db import connections
+
+from . import views
+
+
+def memory_usage_kb():
+    """
+    Returns the current Rss, Pss and Private_Dirty of this process in kB, read
+    from /proc/self/smaps_rollup (Linux only; empty dict elsewhere).
+
+    Rss counts every shared copy-on-write page in full, so for forked workers
+    Pss (shared pages split between the processes using them) and Private_Dirty
+    (pages this process has un-shared or allocated) are the per-worker cost.
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Dirty"):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+
+    return usage
+
+
+def format_memory(usage):
+    """
+    Formats the result of memory_usage_kb() for logs and command output.
+    """
+    if not usage:
+        return "memory usage n/a"
+
+    return ", ".join(f"{key} {value / 1024:.1f} MB" for key, value in usage.items())
+
+
+def warm(reload=False):
+    """
+    Builds the in-process graph snapshot before the process accepts traffic.
+
+    Meant to run in the gunicorn master with --preload: the database connection
+    used for the build is closed so forked workers do not share its socket, and
+    the snapshot is moved to the permanent GC generation so collections in the
+    workers do not write to (and un-share) its pages.
+    With reload, the cached graph is dropped and rebuilt from the database.
+    Returns the build time in seconds and memory_usage_kb() before and after.
+    """
+    memory_before = memory_usage_kb()
+    started = time.perf_counter()
+
+    if reload:
+        views.reload_snapshot()
+    else:
+        views.get_snapshot()
+
+    elapsed = time.perf_counter() - started
+    connections.close_all()
+
+    gc.collect()
+    gc.freeze()
+
+    return {
+        "seconds": elapsed,
+        "memory_before": memory_before,
+        "memory_after": memory_usage_kb(),
+    }
+
+
+def preload_enabled():
+    """
+    Preloading is opt-in through the PRELOAD_GRAPH environment variable.
+    """
+    return os.getenv("PRELOAD_GRAPH", "").lower() in ("1", "true", "yes")
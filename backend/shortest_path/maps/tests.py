@@ -1,3 +1,343 @@
-from django.test import TestCase
+import gc
+import json
+import math
+import os
+import random
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import Resolver404, resolve, reverse
+
+from . import preload, views
+from .geojson import build_snapshot_from_geojson, load_geojson_snapshot
+from .management.commands.replay_routes import percentile
+from .middleware import RouteQueryLogMiddleware
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'routes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class SnapshotTestCase(SimpleTestCase):
+    """
+    Installs a small in-process snapshot so no database is needed.
+    """
+
+    def setUp(self):
+        self.previous_snapshot = views._snapshot
+
+    def tearDown(self):
+        views.set_snapshot(self.previous_snapshot)
+
+    def use_snapshot(self, graph, coords, version=0):
+        snapshot = views.index_snapshot(graph, coords, version)
+        views.set_snapshot(snapshot)
+        return snapshot
+
+
+class FindClosestNodeTests(SnapshotTestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        coords = {
+            node_id: (26.2 + rng.random() * 0.1, 73.0 + rng.random() * 0.1)
+            for node_id in range(500)
+        }
+        self.use_snapshot({node_id: [] for node_id in coords}, coords)
+
+        for _ in range(1000):
+            lat = 26.15 + rng.random() * 0.2
+            lon = 72.95 + rng.random() * 0.2
+            expected = min(coords, key=lambda node_id: views.haversine(lat, lon, *coords[node_id]))
+            self.assertEqual(views.find_closest_node(lat, lon), expected)
+
+    def test_empty_index_returns_none(self):
+        self.use_snapshot({}, {})
+        self.assertIsNone(views.find_closest_node(26.2, 73.0))
+
+    def test_node_id_zero(self):
+        self.use_snapshot({0: [], 1: []}, {0: (26.2, 73.0), 1: (26.3, 73.1)})
+        self.assertEqual(views.find_closest_node(26.2001, 73.0001), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RouteApiTests(SnapshotTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # A line 0 - 1 - 2 - 3 plus a longer shortcut 0 - 3
+        self.coords = {
+            0: (26.200, 73.000),
+            1: (26.201, 73.000),
+            2: (26.202, 73.000),
+            3: (26.203, 73.000),
+        }
+        graph = {0: [], 1: [], 2: [], 3: []}
+        for start, end, weight in [(0, 1, 1.0), (1, 2, 1.0), (2, 3, 1.0), (0, 3, 5.0)]:
+            graph[start].append((end, weight))
+            graph[end].append((start, weight))
+        self.graph = graph
+        self.use_snapshot(graph, self.coords)
+
+    def get_route(self, url_name, start, end):
+        return self.client.get(reverse(url_name), {
+            'start_lat': self.coords[start][0],
+            'start_lon': self.coords[start][1],
+            'end_lat': self.coords[end][0],
+            'end_lon': self.coords[end][1],
+        })
+
+    def test_shortest_path(self):
+        for url_name in ('dijkstra_api', 'astar_api'):
+            with self.subTest(url_name=url_name):
+                response = self.get_route(url_name, 0, 3)
+                self.assertEqual(response.status_code, 200)
+
+                data = response.json()
+                self.assertEqual(data["distance"], 3.0)
+                self.assertEqual(
+                    [(point["lat"], point["lon"]) for point in data["path"]],
+                    [self.coords[node_id] for node_id in (0, 1, 2, 3)],
+                )
+                distances = [point["cumulative_distance"] for point in data["path"]]
+                self.assertEqual(distances, sorted(distances))
+
+    def test_route_cache(self):
+        self.assertEqual(self.get_route('astar_api', 0, 3)["X-Route-Cache"], "miss")
+        self.assertEqual(self.get_route('astar_api', 0, 3)["X-Route-Cache"], "hit")
+        self.assertEqual(self.get_route('dijkstra_api', 0, 3)["X-Route-Cache"], "miss")
+
+        # A new graph version (e.g. after a re-import) must not reuse old routes
+        self.use_snapshot(self.graph, self.coords, version=1)
+        self.assertEqual(self.get_route('astar_api', 0, 3)["X-Route-Cache"], "miss")
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('astar_api'), {'start_lat': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PreloadTests(SnapshotTestCase):
+
+    def test_format_memory(self):
+        self.assertEqual(preload.format_memory({}), "memory usage n/a")
+        self.assertEqual(
+            preload.format_memory({"Rss": 2048, "Pss": 1024}),
+            "Rss 2.0 MB, Pss 1.0 MB",
+        )
+
+    def test_memory_usage_keys(self):
+        usage = preload.memory_usage_kb()
+        self.assertLessEqual(set(usage), {"Rss", "Pss", "Private_Dirty"})
+
+    def test_preload_enabled(self):
+        for value in ("1", "true", "yes", "TRUE", "Yes"):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {"PRELOAD_GRAPH": value}):
+                self.assertTrue(preload.preload_enabled())
+        for value in ("", "0", "false", "no", "on"):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {"PRELOAD_GRAPH": value}):
+                self.assertFalse(preload.preload_enabled())
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertFalse(preload.preload_enabled())
+
+    def test_warm(self):
+        snapshot = views.index_snapshot({1: [], 2: []}, {1: (26.2, 73.0), 2: (26.3, 73.1)})
+        views.set_snapshot(None)
+        self.addCleanup(gc.unfreeze)
+
+        with mock.patch.object(views, "build_snapshot", return_value=snapshot) as build_snapshot:
+            stats = preload.warm()
+
+        build_snapshot.assert_called_once_with()
+        self.assertIs(views.get_snapshot(), snapshot)
+        self.assertEqual(set(stats), {"seconds", "memory_before", "memory_after"})
+        self.assertGreaterEqual(stats["seconds"], 0)
+
+
+def line_feature(coordinates, highway='residential', geometry_type='LineString'):
+    return {
+        "type": "Feature",
+        "properties": {"highway": highway},
+        "geometry": {"type": geometry_type, "coordinates": coordinates},
+    }
+
+
+class TempDirTestCase(SnapshotTestCase):
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = Path(temp_dir.name)
+
+    def write_geojson(self, features, name='lines.geojson'):
+        path = self.temp_dir / name
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+        return str(path)
+
+
+class GeoJsonSnapshotTests(TempDirTestCase):
+
+    def test_build_snapshot(self):
+        path = self.write_geojson([
+            line_feature([[73.0, 26.0], [73.001, 26.0], [73.002, 26.001]]),
+            # Shares its first point with the road above
+            line_feature([[73.002, 26.001], [73.002, 26.003]], highway='primary'),
+            line_feature([[74.0, 27.0], [74.1, 27.1]], highway='footway'),
+            line_feature([[[75.0, 28.0], [75.1, 28.1]]], geometry_type='MultiLineString'),
+            {"type": "Feature", "properties": {"highway": "residential"}, "geometry": None},
+            {"type": "Feature", "properties": None, "geometry": None},
+        ])
+        snapshot = build_snapshot_from_geojson(path)
+
+        self.assertEqual(snapshot["version"], "geojson")
+        self.assertEqual(sorted(snapshot["coords"].values()), [
+            (26.0, 73.0), (26.0, 73.001), (26.001, 73.002), (26.003, 73.002),
+        ])
+
+        ids = {(lon, lat): node_id for node_id, (lat, lon) in snapshot["coords"].items()}
+        shared = ids[(73.002, 26.001)]
+        self.assertEqual(
+            sorted(neighbor for neighbor, _ in snapshot["graph"][shared]),
+            sorted([ids[(73.001, 26.0)], ids[(73.002, 26.003)]]),
+        )
+
+        # Planar weights in degrees, like shapely's LineString.length
+        weights = dict(snapshot["graph"][ids[(73.0, 26.0)]])
+        self.assertEqual(weights, {ids[(73.001, 26.0)]: math.dist((73.0, 26.0), (73.001, 26.0))})
+
+    def test_unreadable_file(self):
+        path = self.temp_dir / 'lines.geojson'
+        path.write_text("version https://git-lfs.github.com/spec/v1\n")
+
+        with self.assertRaisesMessage(CommandError, "git lfs pull"):
+            load_geojson_snapshot(str(path))
+        with self.assertRaisesMessage(CommandError, "git lfs pull"):
+            load_geojson_snapshot(str(self.temp_dir / 'missing.geojson'))
+
+
+class PercentileTests(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 31))
+        self.assertEqual(percentile(values, 50), 15)
+        self.assertEqual(percentile(values, 95), 29)
+        self.assertEqual(percentile(values, 99), 30)
+        self.assertEqual(percentile(values, 100), 30)
+        self.assertEqual(percentile([5], 1), 5)
+
+    def test_empty(self):
+        self.assertTrue(math.isnan(percentile([], 50)))
+
+
+class RouteQueryLogMiddlewareTests(TempDirTestCase):
+
+    def get_response(self, request):
+        try:
+            request.resolver_match = resolve(request.path)
+        except Resolver404:
+            request.resolver_match = None
+        return HttpResponse(status=200)
+
+    def test_disabled_without_log_path(self):
+        with mock.patch.dict(os.environ, clear=True):
+            with self.assertRaises(MiddlewareNotUsed):
+                RouteQueryLogMiddleware(self.get_response)
+
+    def test_logs_route_apis_only(self):
+        log_path = self.temp_dir / 'queries.jsonl'
+        with mock.patch.dict(os.environ, {'ROUTE_QUERY_LOG': str(log_path)}):
+            middleware = RouteQueryLogMiddleware(self.get_response)
+
+        params = {'start_lat': '26.2', 'start_lon': '73.0', 'end_lat': '26.3', 'end_lon': '73.1'}
+        factory = RequestFactory()
+        for path in ('/api/astar/', '/api/dijkstra/', '/admin/login/', '/missing/'):
+            middleware(factory.get(path, params))
+
+        entries = [json.loads(line) for line in log_path.read_text().splitlines()]
+        self.assertEqual([entry["algorithm"] for entry in entries], ['astar', 'dijkstra'])
+        for entry in entries:
+            self.assertEqual({key: entry[key] for key in params}, params)
+            self.assertEqual(entry["status"], 200)
+
+
+class LoadTestCommandTests(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # A 5 x 5 grid of connected roads
+        features = []
+        for i in range(5):
+            features.append(line_feature([[73.0 + j * 0.001, 26.2 + i * 0.001] for j in range(5)]))
+            features.append(line_feature([[73.0 + i * 0.001, 26.2 + j * 0.001] for j in range(5)]))
+        self.geojson = self.write_geojson(features)
+        self.log = self.temp_dir / 'queries.jsonl'
+
+    def replay(self, *args, **options):
+        out = StringIO()
+        call_command('replay_routes', str(self.log), *args, geojson=self.geojson, stdout=out, **options)
+        return out.getvalue()
+
+    def test_sample_and_replay(self):
+        call_command('sample_routes', 10, distinct=1, algorithm='astar', geojson=self.geojson, output=str(self.log))
+
+        entries = [json.loads(line) for line in self.log.read_text().splitlines()]
+        self.assertEqual(len(entries), 10)
+        self.assertEqual({entry["algorithm"] for entry in entries}, {'astar'})
+
+        # One more query with invalid parameters counts as an error
+        with open(self.log, 'a') as f:
+            f.write(json.dumps({"algorithm": "dijkstra", "start_lat": "x"}) + "\n")
+
+        with self.assertLogs('django.request', 'WARNING'):
+            output = self.replay()
+
+        self.assertIn("Requests:     11 in", output)
+        self.assertIn("Error rate:   9.09% (1 errors)", output)
+        self.assertIn("Cache hits:   90.00% (9 of 10)", output)
+
+    def test_replay_with_rate_and_limit(self):
+        call_command('sample_routes', 10, distinct=1, algorithm='dijkstra', geojson=self.geojson, output=str(self.log))
+
+        output = self.replay(rate=500, limit=4)
+
+        self.assertIn("Requests:     4 in", output)
+        self.assertIn("Error rate:   0.00% (0 errors)", output)
+        self.assertIn("Cache hits:   75.00% (3 of 4)", output)
+
+    def test_read_log_errors(self):
+        cases = [
+            ('{"algorithm": "astar"}\nnot json\n', "queries.jsonl:2:"),
+            ('[1, 2]\n', "queries.jsonl:1: expected a JSON object"),
+            ('{"algorithm": "bfs"}\n', "queries.jsonl:1: unknown algorithm 'bfs'"),
+            ('\n', "No queries found"),
+        ]
+        for content, message in cases:
+            with self.subTest(content=content):
+                self.log.write_text(content)
+                with self.assertRaisesMessage(CommandError, message):
+                    self.replay()
+
+    def test_invalid_arguments(self):
+        self.log.write_text('{"algorithm": "astar"}\n')
+        for options, message in [
+            ({'concurrency': 0}, "--concurrency"),
+            ({'rate': -1}, "--rate"),
+            ({'limit': -1}, "--limit"),
+        ]:
+            with self.subTest(options=options):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.replay(**options)
+
+        with self.assertRaisesMessage(CommandError, "count must not be negative"):
+            call_command('sample_routes', -1, geojson=self.geojson)
+        with self.assertRaisesMessage(CommandError, "--distinct must be at least 1"):
+            call_command('sample_routes', 5, distinct=0, geojson=self.geojson)
+        with self.assertRaisesMessage(CommandError, "fewer than two road nodes"):
+            call_command('sample_routes', 5, geojson=self.write_geojson([], name='empty.geojson'))
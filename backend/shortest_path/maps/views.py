@@ -1,8 +1,10 @@
 import math
 import heapq
+import bisect
+import time
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from .models import Node, Edge
 from django.views.decorators.csrf import csrf_exempt
 
@@ -13,27 +15,91 @@ from django.core.cache import cache
 
 def load_graph():
     """
-    Loads the graph from Django's file-based cache.
+    Loads the graph and node coordinates from Django's file-based cache.
+    Both are stored under one key so they always come from the same import.
     If not found, fetch from the database and store in cache.
     """
-    graph = cache.get("graph_data")
+    data = cache.get("graph_snapshot")
     
-    if graph:
-        return graph  # ✅ Return cached graph if available
+    if data:
+        return data  # ✅ Return cached graph if available
 
     # ❌ Cache miss: Rebuild graph from database
-    nodes = Node.objects.all()
-    edges = Edge.objects.all()
+    coords = {
+        node_id: (lat, lon)
+        for node_id, lat, lon in Node.objects.values_list('id', 'latitude', 'longitude')
+    }
+
+    graph = {node_id: [] for node_id in coords}
+    for start_node_id, end_node_id, weight in Edge.objects.values_list('start_node_id', 'end_node_id', 'weight'):
+        graph[start_node_id].append((end_node_id, weight))
+        graph[end_node_id].append((start_node_id, weight))
 
-    graph = {node.id: [] for node in nodes}
-    for edge in edges:
-        graph[edge.start_node_id].append((edge.end_node_id, edge.weight))
-        graph[edge.end_node_id].append((edge.start_node_id, edge.weight))
+    # The version identifies this import, e.g. in route cache keys
+    data = {"graph": graph, "coords": coords, "version": int(time.time())}
 
     # ✅ Store graph in cache with automatic expiry
-    cache.set("graph_data", graph, timeout=3600)  # Refreshes every 1 hour
+    cache.set("graph_snapshot", data, timeout=3600)  # Refreshes every 1 hour
+
+    return data
+
+# In-process snapshot of the graph and its derived structures.
+# Built once per process (or once in the gunicorn master with --preload,
+# then shared copy-on-write by every forked worker). It is kept for the
+# lifetime of the process, so the 1 hour cache expiry above only applies to
+# new processes: after a re-import run `manage.py preload_graph --reload`
+# and restart the workers (a full restart; HUP re-forks from the old master).
+_snapshot = None
+
+def build_snapshot():
+    """
+    Builds the graph, the node coordinates and a latitude-sorted spatial index.
+    """
+    data = load_graph()
+    return index_snapshot(data["graph"], data["coords"], data["version"])
+
+def index_snapshot(graph, coords, version=0):
+    """
+    Bundles the graph and node coordinates with a latitude-sorted spatial index.
+    """
+    # Spatial index: node ids sorted by latitude, with a parallel list of
+    # latitudes for bisect lookups in find_closest_node
+    index_ids = sorted(coords, key=lambda node_id: coords[node_id][0])
+    index_lats = [coords[node_id][0] for node_id in index_ids]
+
+    return {
+        "graph": graph,
+        "coords": coords,
+        "index_ids": index_ids,
+        "index_lats": index_lats,
+        "version": version,
+    }
+
+def get_snapshot():
+    """
+    Returns the in-process snapshot, building it on first use.
+    """
+    global _snapshot
+
+    if _snapshot is None:
+        _snapshot = build_snapshot()
 
-    return graph
+    return _snapshot
+
+def set_snapshot(snapshot):
+    """
+    Replaces the in-process snapshot (e.g. with one built from GeoJSON).
+    """
+    global _snapshot
+    _snapshot = snapshot
+
+def reload_snapshot():
+    """
+    Drops the cached graph and rebuilds the in-process snapshot from the database.
+    """
+    cache.delete("graph_snapshot")
+    set_snapshot(build_snapshot())
+    return _snapshot
 
 def haversine(lat1, lon1, lat2, lon2):
     """
@@ -53,16 +119,42 @@ def haversine(lat1, lon1, lat2, lon2):
 def find_closest_node(lat, lon):
     """
     Finds the closest node in the graph to the given latitude and longitude.
+    Walks outwards from the query latitude in the spatial index and stops as soon
+    as the latitude difference alone is larger than the best distance found.
     """
-    nodes = Node.objects.all()
+    snapshot = get_snapshot()
+    coords = snapshot["coords"]
+    index_ids = snapshot["index_ids"]
+    index_lats = snapshot["index_lats"]
+
     closest_node = None
     min_distance = float('inf')
-    
-    for node in nodes:
-        distance = haversine(lat, lon, node.latitude, node.longitude)
+
+    # Lower bound on the Haversine distance for a given latitude difference
+    km_per_degree = 6371 * math.pi / 180
+
+    lower = bisect.bisect_left(index_lats, lat) - 1
+    upper = lower + 1
+
+    while lower >= 0 or upper < len(index_ids):
+        lower_gap = (lat - index_lats[lower]) * km_per_degree if lower >= 0 else float('inf')
+        upper_gap = (index_lats[upper] - lat) * km_per_degree if upper < len(index_ids) else float('inf')
+
+        if min(lower_gap, upper_gap) >= min_distance:
+            break
+
+        if lower_gap <= upper_gap:
+            node_id = index_ids[lower]
+            lower -= 1
+        else:
+            node_id = index_ids[upper]
+            upper += 1
+
+        node_lat, node_lon = coords[node_id]
+        distance = haversine(lat, lon, node_lat, node_lon)
         if distance < min_distance:
             min_distance = distance
-            closest_node = node.id
+            closest_node = node_id
     
     return closest_node
 
@@ -93,9 +185,10 @@ def heuristic(node1_id, node2_id):
     """
     A heuristic function for A* algorithm using Haversine distance.
     """
-    node1 = Node.objects.get(id=node1_id)
-    node2 = Node.objects.get(id=node2_id)
-    return haversine(node1.latitude, node1.longitude, node2.latitude, node2.longitude)
+    coords = get_snapshot()["coords"]
+    lat1, lon1 = coords[node1_id]
+    lat2, lon2 = coords[node2_id]
+    return haversine(lat1, lon1, lat2, lon2)
 
 def astar(graph, start, end):
     """
@@ -125,6 +218,41 @@ def astar(graph, start, end):
     
     return float('inf'), []
 
+def path_coordinates(coords, path):
+    """
+    Converts a path of node ids into coordinates with cumulative distances,
+    sorted by cumulative distance from the start.
+    """
+    # Compute cumulative distances along the path
+    points = []
+    total_distance = 0
+
+    for i in range(len(path) - 1):
+        lat1, lon1 = coords[path[i]]
+        lat2, lon2 = coords[path[i + 1]]
+
+        distance_between = haversine(lat1, lon1, lat2, lon2)
+        total_distance += distance_between
+
+        points.append({
+            "lat": lat1,
+            "lon": lon1,
+            "cumulative_distance": total_distance
+        })
+
+    # Add final destination
+    last_lat, last_lon = coords[path[-1]]
+    points.append({
+        "lat": last_lat,
+        "lon": last_lon,
+        "cumulative_distance": total_distance
+    })
+
+    # ✅ Sort based on cumulative distance from the start
+    points.sort(key=lambda x: x["cumulative_distance"])
+
+    return points
+
 def find_shortest_path(request, algorithm='astar'):
     """
     API endpoint to find the shortest path using either A* or Dijkstra's algorithm.
@@ -141,53 +269,38 @@ def find_shortest_path(request, algorithm='astar'):
     start_node = find_closest_node(start_lat, start_lon)
     end_node = find_closest_node(end_lat, end_lon)
 
-    if not start_node or not end_node:
+    if start_node is None or end_node is None:
         return JsonResponse({"error": "Could not find nearest nodes"}, status=400)
 
-    graph = load_graph()
+    snapshot = get_snapshot()
+    graph = snapshot["graph"]
+    coords = snapshot["coords"]
 
-    if algorithm == 'dijkstra':
-        distance, path = dijkstra(graph, start_node, end_node)
-    else:
-        distance, path = astar(graph, start_node, end_node)
-
-    if not path:
-        return JsonResponse({"error": "No path found"}, status=404)
-
-    # Fetch nodes maintaining path order
-    nodes = list(Node.objects.filter(id__in=path))
-
-    # Compute cumulative distances along the path
-    path_coordinates = []
-    total_distance = 0
-
-    for i in range(len(path) - 1):
-        node1 = next((n for n in nodes if n.id == path[i]), None)
-        node2 = next((n for n in nodes if n.id == path[i + 1]), None)
+    # Route results are cached per (graph version, algorithm, start node, end node)
+    # as node ids only; the coordinates are rebuilt from the shared snapshot.
+    # The X-Route-Cache header lets clients such as replay_routes measure hit ratio
+    route_cache = caches["routes"]
+    cache_key = f"route:{snapshot['version']}:{algorithm}:{start_node}:{end_node}"
+    cached = route_cache.get(cache_key)
 
-        if node1 and node2:
-            distance_between = haversine(node1.latitude, node1.longitude, node2.latitude, node2.longitude)
-            total_distance += distance_between
+    if cached is not None:
+        distance, path = cached
+        cache_status = "hit"
+    else:
+        if algorithm == 'dijkstra':
+            distance, path = dijkstra(graph, start_node, end_node)
+        else:
+            distance, path = astar(graph, start_node, end_node)
 
-            path_coordinates.append({
-                "lat": node1.latitude,
-                "lon": node1.longitude,
-                "cumulative_distance": total_distance
-            })
+        if not path:
+            return JsonResponse({"error": "No path found"}, status=404)
 
-    # Add final destination
-    last_node = next((n for n in nodes if n.id == path[-1]), None)
-    if last_node:
-        path_coordinates.append({
-            "lat": last_node.latitude,
-            "lon": last_node.longitude,
-            "cumulative_distance": total_distance
-        })
-
-    # ✅ Sort based on cumulative distance from the start
-    path_coordinates.sort(key=lambda x: x["cumulative_distance"])
+        route_cache.set(cache_key, (distance, path))
+        cache_status = "miss"
 
-    return JsonResponse({"distance": distance, "path": path_coordinates})
+    response = JsonResponse({"distance": distance, "path": path_coordinates(coords, path)})
+    response["X-Route-Cache"] = cache_status
+    return response
 
 @csrf_exempt
 def dijkstra_api(request):
@@ -88,6 +88,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'maps.middleware.RouteQueryLogMiddleware',  # Only active when ROUTE_QUERY_LOG is set
 ]
 
 ROOT_URLCONF = 'shortest_path.urls'
@@ -116,7 +117,16 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
         'LOCATION': '/var/tmp/django_cache',  # Set an appropriate directory
         'TIMEOUT': None,  # Keep cached data until manually cleared
-    }
+    },
+    # Route results (node ids only) live in their own bounded per-process
+    # cache so culling them can never evict the cached graph from the default cache
+    'routes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', '1000')),
+        },
+    },
 }
 
 
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shortest_path.settings')
 
 application = get_wsgi_application()
+
+# Warm the graph snapshot before accepting traffic. With gunicorn --preload this
+# runs once in the master and the forked workers share it copy-on-write.
+from maps.preload import preload_enabled, warm  # noqa: E402
+
+if preload_enabled():
+    warm()